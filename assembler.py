@@ -1,17 +1,24 @@
-# ABOUTME: Assembles WAV chunks into M4B (with chapters) or MP3 ZIP audiobooks
+# ABOUTME: Assembles raw PCM chunks into M4B (with chapters) or MP3 ZIP audiobooks
 # ABOUTME: Embeds cover art, metadata tags, and LRC synchronized text via ffmpeg + mutagen
 from __future__ import annotations
 
+import contextlib
+import functools
 import io
 import logging
+import os
 import subprocess
+import tempfile
 import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
 from pydub import AudioSegment
 
 from extractor import BookMetadata, Chapter
 from sync_text import ChapterTiming, generate_chapter_lrc, generate_full_lrc
+from tts_client import PCMAudio
 
 logger = logging.getLogger("audiobook-api.assembler")
 
@@ -19,126 +26,288 @@ SILENCE_BETWEEN_CHUNKS_MS = 500
 SILENCE_PARAGRAPH_BREAK_MS = 1500
 SILENCE_BETWEEN_CHAPTERS_MS = 3000
 
+FFMPEG_PIPE_BUFSIZE = 1 << 20  # 1 MB stdin buffer when streaming PCM to ffmpeg
+# Sample width (bytes) -> ffmpeg raw PCM demuxer; these are all the widths
+# the wave module reads. 8-bit WAV is unsigned, the rest signed
+PCM_FORMATS = {1: "u8", 2: "s16le", 3: "s24le", 4: "s32le"}
 
-def _get_wav_duration_secs(wav_bytes: bytes) -> float:
-    """Get duration of WAV audio in seconds."""
-    seg = AudioSegment.from_wav(io.BytesIO(wav_bytes))
-    return seg.duration_seconds
+# Special chars that must be backslash-escaped in ffmetadata values
+_FFMETA_ESCAPE = str.maketrans({"\\": "\\\\", "=": "\\=", ";": "\\;", "#": "\\#", "\n": "\\n"})
+
+
+@functools.lru_cache(maxsize=16)
+def _silence_bytes(frame_rate: int, channels: int, sample_width: int, ms: int) -> bytes:
+    """Raw PCM silence of the given length, frame-aligned.
+
+    Only a few distinct (format, length) pairs occur per book, so the same
+    immutable buffer is shared by every gap instead of being rebuilt.
+    """
+    # Unsigned 8-bit PCM is centred on 0x80, not zero
+    sample = b"\x80" if sample_width == 1 else b"\x00" * sample_width
+    return sample * (channels * (frame_rate * ms // 1000))
+
+
+def _pcm_input_args(audio: AudioSegment) -> list[str]:
+    """ffmpeg options to read raw PCM in the segment's format from stdin."""
+    pcm_format = PCM_FORMATS.get(audio.sample_width)
+    if pcm_format is None:
+        raise ValueError(f"Unsupported PCM sample width: {audio.sample_width} bytes")
+    return [
+        "-f", pcm_format,
+        "-ar", str(audio.frame_rate),
+        "-ac", str(audio.channels),
+        "-i", "pipe:0",
+    ]
+
+
+class _FFmpegPipe:
+    """An ffmpeg process fed raw PCM through its stdin.
+
+    stderr goes to a temp file so a chatty ffmpeg can't fill the pipe and
+    deadlock against our stdin writes.
+    """
+
+    def __init__(self, cmd: list[str], label: str):
+        self.label = label
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=self._stderr,
+            bufsize=FFMPEG_PIPE_BUFSIZE,
+        )
+
+    def write(self, data: bytes):
+        try:
+            self._proc.stdin.write(data)
+        except BrokenPipeError:
+            # ffmpeg exited early; close() raises with its stderr
+            self.close()
+            raise RuntimeError(f"ffmpeg {self.label} stopped reading input")
+
+    def close(self):
+        """End the input stream and wait for ffmpeg. Raises RuntimeError on failure."""
+        with contextlib.suppress(BrokenPipeError):
+            self._proc.stdin.close()
+        returncode = self._proc.wait()
+        try:
+            if returncode != 0:
+                self._stderr.seek(0)
+                err = self._stderr.read().decode(errors="replace")
+                logger.error("ffmpeg %s failed: %s", self.label, err)
+                raise RuntimeError(f"ffmpeg {self.label} failed: {err[:500]}")
+        finally:
+            self._stderr.close()
+
+    def kill(self):
+        self._proc.kill()
+        with contextlib.suppress(BrokenPipeError):
+            self._proc.stdin.close()
+        self._proc.wait()
+        self._stderr.close()
+
+
+def _run_ffmpeg_capture(cmd: list[str], pcm: bytes, label: str) -> bytes:
+    """Run ffmpeg on in-memory raw PCM and return what it writes to stdout."""
+    result = subprocess.run(cmd, input=pcm, capture_output=True)
+    if result.returncode != 0:
+        err = result.stderr.decode(errors="replace")
+        logger.error("ffmpeg %s failed: %s", label, err)
+        raise RuntimeError(f"ffmpeg {label} failed: {err[:500]}")
+    return result.stdout
 
 
 def assemble_chapter_wav(
-    chunk_wavs: list[bytes],
+    chunk_audio: list[PCMAudio],
     paragraph_breaks: list[bool],
 ) -> tuple[AudioSegment, float]:
-    """Concatenate chunk WAVs into a single chapter AudioSegment.
+    """Concatenate chunk PCM into a single chapter AudioSegment.
+
+    Collects raw PCM and joins it once instead of repeated AudioSegment
+    appends, which copy the whole accumulated chapter on every chunk.
 
     Returns (chapter_audio, total_duration_secs).
     """
-    chapter = AudioSegment.empty()
-
-    for i, wav_bytes in enumerate(chunk_wavs):
-        segment = AudioSegment.from_wav(io.BytesIO(wav_bytes))
+    if not chunk_audio:
+        return AudioSegment.empty(), 0.0
+
+    first = chunk_audio[0]
+    params = (first.sample_width, first.frame_rate, first.channels)
+    silence_short = _silence_bytes(first.frame_rate, first.channels, first.sample_width, SILENCE_BETWEEN_CHUNKS_MS)
+    silence_long = _silence_bytes(first.frame_rate, first.channels, first.sample_width, SILENCE_PARAGRAPH_BREAK_MS)
+    parts: list[bytes] = []
+
+    for i, audio in enumerate(chunk_audio):
+        if (audio.sample_width, audio.frame_rate, audio.channels) != params:
+            raise ValueError(
+                f"Chunk {i} audio format {(audio.sample_width, audio.frame_rate, audio.channels)} "
+                f"differs from chapter format {params}"
+            )
         if i > 0:
             # Insert appropriate silence
-            if paragraph_breaks[i - 1]:
-                chapter += AudioSegment.silent(duration=SILENCE_PARAGRAPH_BREAK_MS)
-            else:
-                chapter += AudioSegment.silent(duration=SILENCE_BETWEEN_CHUNKS_MS)
-        chapter += segment
+            parts.append(silence_long if paragraph_breaks[i - 1] else silence_short)
+        parts.append(audio.data)
 
-    return chapter, chapter.duration_seconds
+    sample_width, frame_rate, channels = params
+    data = b"".join(parts)
+    chapter = AudioSegment(data=data, sample_width=sample_width, frame_rate=frame_rate, channels=channels)
+    return chapter, len(data) / (sample_width * frame_rate * channels)
 
 
-def assemble_m4b(
-    job_dir: Path,
-    chapter_audios: list[AudioSegment],
-    chapters: list[Chapter],
-    metadata: BookMetadata,
-    cover_image: bytes | None,
-    chapter_timings: list[ChapterTiming],
-) -> Path:
-    """Assemble chapter WAVs into a single M4B with chapters, cover art, and LRC."""
-    # Concatenate all chapters with inter-chapter silence
-    full_audio = AudioSegment.empty()
-    chapter_starts_ms: list[int] = []
-
-    for i, audio in enumerate(chapter_audios):
-        chapter_starts_ms.append(len(full_audio))
-        full_audio += audio
-        if i < len(chapter_audios) - 1:
-            full_audio += AudioSegment.silent(duration=SILENCE_BETWEEN_CHAPTERS_MS)
-
-    # Export concatenated WAV
-    concat_wav = job_dir / "concat.wav"
-    full_audio.export(str(concat_wav), format="wav")
-
-    # Write ffmpeg metadata file with chapter markers
-    metadata_file = job_dir / "metadata.txt"
-    with open(metadata_file, "w") as f:
-        f.write(";FFMETADATA1\n")
-        f.write(f"title={metadata.title}\n")
-        f.write(f"artist={metadata.author}\n")
-        f.write(f"album={metadata.title}\n")
-        f.write(f"genre=Audiobook\n")
+class M4BWriter:
+    """Builds an M4B incrementally as chapters finish generating.
+
+    Each chapter's PCM is streamed into a running AAC encode as soon as it
+    is added, so encoding overlaps TTS generation of later chapters.
+    finish() then remuxes the AAC stream (no re-encode) with chapter
+    markers, cover art, tags, and LRC lyrics.
+    """
+
+    def __init__(self, job_dir: Path, metadata: BookMetadata, cover_image: bytes | None):
+        self.job_dir = job_dir
+        self.metadata = metadata
+        self.cover_image = cover_image
+        self._audio_path = job_dir / "audio.m4a"
+        self._metadata_path = job_dir / "metadata.txt"
+        self.output_m4b = job_dir / "audiobook.m4b"
+        self._encoder: _FFmpegPipe | None = None
+        self._format: tuple[int, int, int] | None = None
+        self._silence = b""
+        self._frames = 0
+        self._chapter_starts: list[int] = []  # in frames
+        self._titles: list[str] = []
+        self._timings: list[ChapterTiming] = []
+
+    def add_chapter(self, audio: AudioSegment, chapter: Chapter, timing: ChapterTiming):
+        """Stream a chapter (preceded by inter-chapter silence) into the encoder."""
+        fmt = (audio.sample_width, audio.frame_rate, audio.channels)
+        if self._encoder is None:
+            self._format = fmt
+            self._silence = _silence_bytes(
+                audio.frame_rate, audio.channels, audio.sample_width, SILENCE_BETWEEN_CHAPTERS_MS,
+            )
+            cmd = [
+                "ffmpeg", "-y", *_pcm_input_args(audio),
+                "-map", "0:a",
+                "-c:a", "aac", "-b:a", "128k",
+                str(self._audio_path),
+            ]
+            logger.info("Starting ffmpeg AAC encode for M4B: %s", " ".join(cmd))
+            self._encoder = _FFmpegPipe(cmd, "M4B")
+        elif fmt != self._format:
+            raise ValueError(f"Chapter {len(self._titles) + 1} audio format differs from chapter 1")
+        else:
+            self._encoder.write(self._silence)
+            self._frames += len(self._silence) // audio.frame_width
+
+        self._chapter_starts.append(self._frames)
+        self._encoder.write(audio.raw_data)
+        self._frames += len(audio.raw_data) // audio.frame_width
+        self._titles.append(chapter.title)
+        self._timings.append(timing)
+
+    def finish(self) -> Path:
+        """Close the encode and mux chapters, cover art, and tags into the M4B."""
+        if self._encoder is None:
+            raise ValueError("No chapter audio to assemble")
+        self._encoder.close()
+
+        frame_rate = self._format[1]
+        chapter_starts_ms = [frames * 1000 // frame_rate for frames in self._chapter_starts]
+        total_ms = self._frames * 1000 // frame_rate
+        metadata = self.metadata
+
+        # Write ffmpeg metadata file with chapter markers
+        metadata_file = self._metadata_path
+        parts = [
+            ";FFMETADATA1\n",
+            f"title={metadata.title}\n",
+            f"artist={metadata.author}\n",
+            f"album={metadata.title}\n",
+            "genre=Audiobook\n",
+        ]
         if metadata.year:
-            f.write(f"date={metadata.year}\n")
+            parts.append(f"date={metadata.year}\n")
         if metadata.description:
             # Escape special chars for ffmetadata
-            desc = metadata.description.replace("\\", "\\\\").replace("=", "\\=").replace(";", "\\;").replace("#", "\\#").replace("\n", "\\n")
-            f.write(f"description={desc}\n")
-        f.write("\n")
-
-        for i, title in enumerate(ch.title for ch in chapters):
-            start_ms = chapter_starts_ms[i]
-            # End is start of next chapter or end of audio
-            if i + 1 < len(chapter_starts_ms):
-                end_ms = chapter_starts_ms[i + 1]
-            else:
-                end_ms = len(full_audio)
-            f.write("[CHAPTER]\n")
-            f.write("TIMEBASE=1/1000\n")
-            f.write(f"START={start_ms}\n")
-            f.write(f"END={end_ms}\n")
-            f.write(f"title={title}\n")
-            f.write("\n")
-
-    # Build ffmpeg command
-    output_m4b = job_dir / "audiobook.m4b"
-    cmd = ["ffmpeg", "-y", "-i", str(concat_wav), "-i", str(metadata_file)]
+            desc = metadata.description.translate(_FFMETA_ESCAPE)
+            parts.append(f"description={desc}\n")
+        parts.append("\n")
+
+        # Each chapter ends where the next starts, the last at end of audio
+        chapter_ends_ms = chapter_starts_ms[1:] + [total_ms]
+        for title, start_ms, end_ms in zip(self._titles, chapter_starts_ms, chapter_ends_ms):
+            parts.append(f"[CHAPTER]\nTIMEBASE=1/1000\nSTART={start_ms}\nEND={end_ms}\ntitle={title}\n\n")
+
+        metadata_file.write_text("".join(parts), encoding="utf-8")
+
+        # Build ffmpeg remux command; the AAC stream is copied as-is
+        output_m4b = self.output_m4b
+        cmd = ["ffmpeg", "-y", "-i", str(self._audio_path), "-i", str(metadata_file)]
+
+        if self.cover_image:
+            cover_path = self.job_dir / "cover.jpg"
+            cover_path.write_bytes(self.cover_image)
+            cmd.extend(["-i", str(cover_path)])
+            cmd.extend([
+                "-map", "0:a", "-map", "2:v",
+                "-c:v", "mjpeg",
+                "-disposition:v:0", "attached_pic",
+            ])
+        else:
+            cmd.extend(["-map", "0:a"])
 
-    if cover_image:
-        cover_path = job_dir / "cover.jpg"
-        cover_path.write_bytes(cover_image)
-        cmd.extend(["-i", str(cover_path)])
         cmd.extend([
-            "-map", "0:a", "-map", "2:v",
-            "-c:v", "mjpeg",
-            "-disposition:v:0", "attached_pic",
+            "-map_metadata", "1",
+            "-c:a", "copy",
+            str(output_m4b),
         ])
-    else:
-        cmd.extend(["-map", "0:a"])
 
-    cmd.extend([
-        "-map_metadata", "1",
-        "-c:a", "aac", "-b:a", "128k",
-        str(output_m4b),
-    ])
+        logger.info("Running ffmpeg for M4B: %s", " ".join(cmd))
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            logger.error("ffmpeg M4B failed: %s", result.stderr)
+            raise RuntimeError(f"ffmpeg failed: {result.stderr[:500]}")
+
+        # Post-process with mutagen to embed LRC lyrics and additional metadata
+        _embed_m4b_metadata(output_m4b, metadata, self._timings)
 
-    logger.info("Running ffmpeg for M4B: %s", " ".join(cmd))
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        logger.error("ffmpeg M4B failed: %s", result.stderr)
-        raise RuntimeError(f"ffmpeg failed: {result.stderr[:500]}")
+        # Cleanup temp files
+        self._audio_path.unlink(missing_ok=True)
+        metadata_file.unlink(missing_ok=True)
 
-    # Post-process with mutagen to embed LRC lyrics and additional metadata
-    _embed_m4b_metadata(output_m4b, metadata, chapter_timings)
+        logger.info("M4B assembled: %s (%.1f MB)", output_m4b, output_m4b.stat().st_size / 1e6)
+        return output_m4b
 
-    # Cleanup temp files
-    concat_wav.unlink(missing_ok=True)
-    metadata_file.unlink(missing_ok=True)
+    def abort(self):
+        """Stop a partial encode and remove its output, including a finished M4B.
 
-    logger.info("M4B assembled: %s (%.1f MB)", output_m4b, output_m4b.stat().st_size / 1e6)
-    return output_m4b
+        Must not overlap add_chapter() or finish(); callers wait for those first.
+        """
+        if self._encoder is not None:
+            self._encoder.kill()
+        for path in (self._audio_path, self._metadata_path, self.output_m4b):
+            path.unlink(missing_ok=True)
+
+
+def assemble_m4b(
+    job_dir: Path,
+    chapter_audios: list[AudioSegment],
+    chapters: list[Chapter],
+    metadata: BookMetadata,
+    cover_image: bytes | None,
+    chapter_timings: list[ChapterTiming],
+) -> Path:
+    """Assemble chapter audio into a single M4B with chapters, cover art, and LRC."""
+    writer = M4BWriter(job_dir, metadata, cover_image)
+    try:
+        for audio, chapter, timing in zip(chapter_audios, chapters, chapter_timings):
+            writer.add_chapter(audio, chapter, timing)
+        return writer.finish()
+    except BaseException:
+        writer.abort()
+        raise
 
 
 def _embed_m4b_metadata(
@@ -169,118 +338,156 @@ def _embed_m4b_metadata(
     logger.info("Embedded mutagen metadata + LRC lyrics in M4B")
 
 
-def assemble_mp3_zip(
-    job_dir: Path,
-    chapter_audios: list[AudioSegment],
-    chapters: list[Chapter],
+def _encode_chapter_mp3(
+    chapter_num: int,
+    total_chapters: int,
+    audio: AudioSegment,
+    chapter: Chapter,
+    timing: ChapterTiming,
     metadata: BookMetadata,
     cover_image: bytes | None,
-    chapter_timings: list[ChapterTiming],
-) -> Path:
-    """Assemble per-chapter MP3s + LRC files into a ZIP archive."""
-    mp3_dir = job_dir / "mp3s"
-    mp3_dir.mkdir(exist_ok=True)
+) -> tuple[bytes, str]:
+    """Encode one chapter to tagged MP3 bytes plus companion LRC text."""
+    # Build ffmpeg command for MP3; chapter PCM goes in on stdin and the
+    # MP3 comes back on stdout, nothing touches disk. Text tags are written
+    # by the muxer, so the MP3 needs no tagging pass afterwards
+    cmd = [
+        "ffmpeg", "-y", *_pcm_input_args(audio),
+        "-map", "0:a",
+        "-c:a", "libmp3lame", "-b:a", "192k",
+        "-id3v2_version", "3",
+        "-metadata", f"title={chapter.title}",
+        "-metadata", f"artist={metadata.author}",
+        "-metadata", f"album={metadata.title}",
+        "-metadata", f"track={chapter_num}/{total_chapters}",
+        "-metadata", "genre=Audiobook",
+    ]
+    if metadata.year:
+        cmd.extend(["-metadata", f"date={metadata.year}"])
+    cmd.extend(["-f", "mp3", "pipe:1"])
+    mp3 = _run_ffmpeg_capture(cmd, audio.raw_data, f"MP3 for chapter {chapter_num}")
 
-    mp3_files: list[Path] = []
-    lrc_files: list[Path] = []
-    total_chapters = len(chapter_audios)
+    if cover_image:
+        mp3 = _embed_mp3_cover(mp3, cover_image)
 
-    for i, (audio, chapter, timing) in enumerate(zip(chapter_audios, chapters, chapter_timings)):
-        chapter_num = i + 1
-        chapter_wav = mp3_dir / f"chapter_{chapter_num:02d}.wav"
-        audio.export(str(chapter_wav), format="wav")
+    return mp3, generate_chapter_lrc(timing)
 
-        chapter_mp3 = mp3_dir / f"chapter_{chapter_num:02d}.mp3"
 
-        # Build ffmpeg command for MP3
-        cmd = ["ffmpeg", "-y", "-i", str(chapter_wav)]
+class MP3ZipWriter:
+    """Builds the MP3 ZIP incrementally as chapters finish generating.
 
-        if cover_image:
-            cover_path = job_dir / "cover.jpg"
-            if not cover_path.exists():
-                cover_path.write_bytes(cover_image)
-            cmd.extend([
-                "-i", str(cover_path),
-                "-map", "0:a", "-map", "1",
-                "-c:a", "libmp3lame", "-b:a", "192k",
-                "-id3v2_version", "3",
-                "-metadata:s:v", "title=Cover",
-            ])
-        else:
-            cmd.extend([
-                "-map", "0:a",
-                "-c:a", "libmp3lame", "-b:a", "192k",
-                "-id3v2_version", "3",
-            ])
+    Each added chapter is encoded right away on a worker thread, so MP3
+    encoding overlaps TTS generation of later chapters. libmp3lame is
+    single-threaded per stream, so several chapters encode side by side
+    (the threads only wait on ffmpeg subprocesses). Encoded chapters are
+    written straight into the ZIP, in chapter order, without per-chapter
+    files on disk.
+    """
 
-        cmd.append(str(chapter_mp3))
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            logger.error("ffmpeg MP3 chapter %d failed: %s", chapter_num, result.stderr)
-            raise RuntimeError(f"ffmpeg MP3 failed for chapter {chapter_num}: {result.stderr[:500]}")
-
-        # Embed ID3 tags via mutagen
-        _embed_mp3_metadata(chapter_mp3, chapter, metadata, chapter_num, total_chapters, cover_image)
-
-        mp3_files.append(chapter_mp3)
-        chapter_wav.unlink(missing_ok=True)
-
-        # Generate companion LRC
-        lrc_content = generate_chapter_lrc(timing)
-        lrc_path = mp3_dir / f"chapter_{chapter_num:02d}.lrc"
-        lrc_path.write_text(lrc_content, encoding="utf-8")
-        lrc_files.append(lrc_path)
-
-    # Create ZIP
-    output_zip = job_dir / "audiobook.zip"
-    with zipfile.ZipFile(output_zip, "w", zipfile.ZIP_DEFLATED) as zf:
-        for mp3 in mp3_files:
-            zf.write(mp3, mp3.name)
-        for lrc in lrc_files:
-            zf.write(lrc, lrc.name)
-        if cover_image:
-            zf.writestr("cover.jpg", cover_image)
-
-    # Cleanup
-    for f in mp3_files + lrc_files:
-        f.unlink(missing_ok=True)
-    mp3_dir.rmdir()
-
-    logger.info("MP3 ZIP assembled: %s (%.1f MB)", output_zip, output_zip.stat().st_size / 1e6)
-    return output_zip
-
-
-def _embed_mp3_metadata(
-    mp3_path: Path,
-    chapter: Chapter,
+    def __init__(
+        self,
+        job_dir: Path,
+        metadata: BookMetadata,
+        cover_image: bytes | None,
+        total_chapters: int,
+    ):
+        self.job_dir = job_dir
+        self.metadata = metadata
+        self.cover_image = cover_image
+        self.total_chapters = total_chapters
+        self.output_zip = job_dir / "audiobook.zip"
+
+        max_workers = max(1, min(os.cpu_count() or 1, total_chapters))
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending: deque[Future[tuple[bytes, str]]] = deque()
+        self._chapters_added = 0
+        self._chapters_written = 0
+
+        # MP3 and JPEG are already compressed, so only the LRC text is deflated
+        self._zip = zipfile.ZipFile(self.output_zip, "w", zipfile.ZIP_STORED)
+
+    def add_chapter(self, audio: AudioSegment, chapter: Chapter, timing: ChapterTiming):
+        """Queue a chapter for MP3 encoding."""
+        self._chapters_added += 1
+        self._pending.append(self._pool.submit(
+            _encode_chapter_mp3, self._chapters_added, self.total_chapters,
+            audio, chapter, timing, self.metadata, self.cover_image,
+        ))
+        self._write_finished(wait=False)
+
+    def _write_finished(self, wait: bool):
+        """Move encoded chapters into the ZIP, oldest first.
+
+        Stops at the first chapter still encoding unless wait is set, so
+        entries keep chapter order and only out-of-order results are held
+        in memory.
+        """
+        while self._pending and (wait or self._pending[0].done()):
+            mp3, lrc = self._pending.popleft().result()
+            self._chapters_written += 1
+            name = f"chapter_{self._chapters_written:02d}"
+            self._zip.writestr(f"{name}.mp3", mp3)
+            self._zip.writestr(f"{name}.lrc", lrc, compress_type=zipfile.ZIP_DEFLATED)
+
+    def finish(self) -> Path:
+        """Wait for the remaining chapter encodes and close the ZIP."""
+        try:
+            self._write_finished(wait=True)
+        finally:
+            self._pool.shutdown()
+
+        if self.cover_image:
+            self._zip.writestr("cover.jpg", self.cover_image)
+        self._zip.close()
+
+        logger.info("MP3 ZIP assembled: %s (%.1f MB)", self.output_zip, self.output_zip.stat().st_size / 1e6)
+        return self.output_zip
+
+    def abort(self):
+        """Drop queued encodes, wait for running ones, and remove the partial ZIP.
+
+        Must not overlap add_chapter() or finish(); callers wait for those first.
+        """
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._zip.close()
+        self.output_zip.unlink(missing_ok=True)
+
+
+def assemble_mp3_zip(
+    job_dir: Path,
+    chapter_audios: list[AudioSegment],
+    chapters: list[Chapter],
     metadata: BookMetadata,
-    chapter_num: int,
-    total_chapters: int,
     cover_image: bytes | None,
-):
-    """Embed ID3 tags in an MP3 file via mutagen."""
-    from mutagen.id3 import APIC, ID3, TALB, TCON, TDRC, TIT2, TPE1, TRCK
-
+    chapter_timings: list[ChapterTiming],
+) -> Path:
+    """Assemble per-chapter MP3s + LRC files into a ZIP archive."""
+    writer = MP3ZipWriter(job_dir, metadata, cover_image, len(chapter_audios))
     try:
-        tags = ID3(str(mp3_path))
-    except Exception:
-        tags = ID3()
-
-    tags["TIT2"] = TIT2(encoding=3, text=[chapter.title])
-    tags["TPE1"] = TPE1(encoding=3, text=[metadata.author])
-    tags["TALB"] = TALB(encoding=3, text=[metadata.title])
-    tags["TRCK"] = TRCK(encoding=3, text=[f"{chapter_num}/{total_chapters}"])
-    tags["TCON"] = TCON(encoding=3, text=["Audiobook"])
-    if metadata.year:
-        tags["TDRC"] = TDRC(encoding=3, text=[metadata.year])
+        for audio, chapter, timing in zip(chapter_audios, chapters, chapter_timings):
+            writer.add_chapter(audio, chapter, timing)
+        return writer.finish()
+    except BaseException:
+        writer.abort()
+        raise
 
-    if cover_image:
-        tags["APIC"] = APIC(
-            encoding=3,
-            mime="image/jpeg",
-            type=3,  # Cover (front)
-            desc="Cover",
-            data=cover_image,
-        )
 
-    tags.save(str(mp3_path))
+def _embed_mp3_cover(mp3: bytes, cover_image: bytes) -> bytes:
+    """Add front cover art to the ID3 tag of in-memory MP3 bytes via mutagen.
+
+    ffmpeg can attach the cover itself, but only patches the ID3 header
+    size by seeking back, which it can't do when writing to a pipe.
+    """
+    from mutagen.id3 import APIC, ID3
+
+    buf = io.BytesIO(mp3)
+    tags = ID3(buf)
+    tags.add(APIC(
+        encoding=3,
+        mime="image/jpeg",
+        type=3,  # Cover (front)
+        desc="Cover",
+        data=cover_image,
+    ))
+    tags.save(buf, v2_version=3)
+    return buf.getvalue()
@@ -8,8 +8,9 @@ from dataclasses import dataclass
 TARGET_WORDS = 300   # Conservative for MPS fp32 voice cloning
 MAX_WORDS = 400      # Hard ceiling before forcing a split
 
-# Sentence boundary: after .!? followed by whitespace
-SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+# Sentence boundary (.!? followed by whitespace) or paragraph boundary
+# (blank line). Leading with a character class lets re skip ahead quickly.
+SENTENCE_SPLIT = re.compile(r"[.!?\n](?:(?<=\n)\n|(?<=[.!?])\s)\s*")
 # Fallback split: commas, semicolons, colons, em-dashes
 CLAUSE_SPLIT = re.compile(r"(?<=[,;:\u2014])\s+")
 
@@ -19,21 +20,31 @@ class Chunk:
     text: str
     paragraph_break: bool  # True if chunk ends at a paragraph boundary
     sentences: list[str]   # Individual sentences for LRC timing
+    word_count: int        # Words in text, counted once while chunking
+
+
+def _split_sentences(text: str) -> list[tuple[str, bool]]:
+    """Split text into (sentence, is_last_in_paragraph) records in one regex pass."""
+    text = text.strip()
+    if not text:
+        return []
+    records: list[tuple[str, bool]] = []
+    pos = 0
+    for m in SENTENCE_SPLIT.finditer(text):
+        end = m.start()
+        if text[end] == "\n":
+            # Blank line with no sentence punctuation before it
+            records.append((text[pos:end].rstrip(), True))
+        else:
+            records.append((text[pos:end + 1], "\n\n" in m.group()))
+        pos = m.end()
+    records.append((text[pos:], True))
+    return records
 
 
 def chunk_text(text: str) -> list[Chunk]:
     """Split text into ~1200-word chunks at sentence boundaries."""
-    # Split into paragraphs first (for paragraph-break tracking)
-    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
-
-    # Collect all sentences with their paragraph membership
-    sentence_records: list[tuple[str, bool]] = []  # (sentence, is_last_in_paragraph)
-    for para in paragraphs:
-        sentences = SENTENCE_SPLIT.split(para)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        for i, sent in enumerate(sentences):
-            is_last = i == len(sentences) - 1
-            sentence_records.append((sent, is_last))
+    sentence_records = _split_sentences(text)
 
     # Greedily accumulate sentences into chunks
     chunks: list[Chunk] = []
@@ -52,6 +63,7 @@ def chunk_text(text: str) -> list[Chunk]:
                     text=" ".join(current_sentences),
                     paragraph_break=ends_paragraph,
                     sentences=list(current_sentences),
+                    word_count=current_words,
                 ))
                 current_sentences = []
                 current_words = 0
@@ -67,6 +79,7 @@ def chunk_text(text: str) -> list[Chunk]:
                         text=" ".join(current_sentences),
                         paragraph_break=False,
                         sentences=list(current_sentences),
+                        word_count=current_words,
                     ))
                     current_sentences = []
                     current_words = 0
@@ -81,6 +94,7 @@ def chunk_text(text: str) -> list[Chunk]:
                 text=" ".join(current_sentences),
                 paragraph_break=ends_paragraph,
                 sentences=list(current_sentences),
+                word_count=current_words,
             ))
             current_sentences = []
             current_words = 0
@@ -95,6 +109,7 @@ def chunk_text(text: str) -> list[Chunk]:
             text=" ".join(current_sentences),
             paragraph_break=True,
             sentences=list(current_sentences),
+            word_count=current_words,
         ))
 
     return chunks
@@ -1,52 +1,134 @@
 # ABOUTME: Pipeline orchestrator for audiobook conversion
-# ABOUTME: Coordinates extraction → chunking → TTS → assembly with MD5 caching
+# ABOUTME: Coordinates extraction → chunking → TTS → assembly with BLAKE2b chunk caching
 from __future__ import annotations
 
 import asyncio
+import base64
 import hashlib
-import io
+import json
 import logging
+import os
+import tempfile
 from pathlib import Path
 
 from pydub import AudioSegment
 
 import jobs
-from assembler import (
-    _get_wav_duration_secs,
-    assemble_chapter_wav,
-    assemble_m4b,
-    assemble_mp3_zip,
-)
+from assembler import M4BWriter, MP3ZipWriter, assemble_chapter_wav
 from chunker import chunk_text
-from extractor import extract
+from extractor import Chapter, extract
 from sync_text import ChapterTiming, ChunkTiming
-from tts_client import TTSClient
+from tts_client import PCMAudio, TTSClient
 
 logger = logging.getLogger("audiobook-api.converter")
 
 CACHE_DIR = Path("data/cache")
 OUTPUT_DIR = Path("data/output")
 
+# Chunks of a chapter sent to the TTS server at once
+MAX_CONCURRENT_TTS = max(1, int(os.environ.get("MAX_CONCURRENT_TTS", "2")))
+
 
 def _cache_key(text: str, voice: str, language: str, use_clone: bool) -> str:
-    """MD5 hash for chunk caching."""
+    """BLAKE2b hash for chunk caching."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(text.encode())
+    h.update(b"|")
+    h.update(voice.encode())
+    h.update(b"|")
+    h.update(language.encode())
+    h.update(b"|True" if use_clone else b"|False")
+    return h.hexdigest()
+
+
+def _legacy_cache_key(text: str, voice: str, language: str, use_clone: bool) -> str:
+    """MD5 key used by cache entries written before the switch to BLAKE2b."""
     content = f"{text}|{voice}|{language}|{use_clone}"
     return hashlib.md5(content.encode()).hexdigest()
 
 
-def _get_cached(key: str) -> bytes | None:
-    """Retrieve cached WAV bytes by key."""
-    path = CACHE_DIR / f"{key}.wav"
-    if path.exists():
-        return path.read_bytes()
+def _adopt_legacy_cache(legacy_key: str, key: str) -> bool:
+    """Rename an MD5-keyed cache entry to its BLAKE2b key. Returns True if one existed."""
+    legacy_wav = CACHE_DIR / f"{legacy_key}.wav"
+    if not legacy_wav.exists():
+        return False
+    legacy_wav.replace(CACHE_DIR / f"{key}.wav")
+    return True
+
+
+def _get_cached(key: str) -> PCMAudio | None:
+    """Retrieve cached chunk PCM by key.
+
+    Entries are raw PCM ({key}.pcm) plus a JSON format sidecar ({key}.json).
+    Both are renamed into place whole, the sidecar last, so its presence
+    marks a complete entry. WAV entries from before raw PCM caching are
+    converted in place on first hit.
+    """
+    pcm_path = CACHE_DIR / f"{key}.pcm"
+    fmt_path = CACHE_DIR / f"{key}.json"
+    if pcm_path.exists() and fmt_path.exists():
+        fmt = json.loads(fmt_path.read_text())
+        return PCMAudio(pcm_path.read_bytes(), fmt["sample_width"], fmt["frame_rate"], fmt["channels"])
+
+    wav_path = CACHE_DIR / f"{key}.wav"
+    if wav_path.exists():
+        audio = PCMAudio.from_wav(wav_path.read_bytes())
+        _save_cache(key, audio)
+        wav_path.unlink(missing_ok=True)
+        return audio
     return None
 
 
-def _save_cache(key: str, wav_bytes: bytes):
-    """Save WAV bytes to cache."""
+def _save_cache(key: str, audio: PCMAudio):
+    """Save chunk PCM and its format sidecar to cache, PCM first.
+
+    Two jobs can generate the same chunk at once (e.g. the same book
+    converted twice); writing through temp files means neither ever
+    truncates a .pcm that the other's sidecar already vouches for.
+    """
     CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    path = CACHE_DIR / f"{key}.wav"
-    path.write_bytes(wav_bytes)
+    _write_replace(CACHE_DIR / f"{key}.pcm", audio.data)
+    _write_replace(CACHE_DIR / f"{key}.json", json.dumps({
+        "sample_width": audio.sample_width,
+        "frame_rate": audio.frame_rate,
+        "channels": audio.channels,
+    }).encode())
+
+
+def _write_replace(path: Path, data: bytes):
+    """Write data to a temp file beside path, then atomically rename it over path."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+async def _in_writer_thread(func, *args):
+    """Run a writer method in a worker thread that cancellation can't orphan.
+
+    Cancelling a plain to_thread await returns while the thread keeps
+    running, so the writer's abort() would race the call still in flight.
+    Here a cancel first waits for the thread to finish, then propagates.
+    """
+    call = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        return await asyncio.shield(call)
+    except asyncio.CancelledError:
+        await asyncio.wait({call})
+        raise
+
+
+async def _assemble_chapters(
+    writer: M4BWriter | MP3ZipWriter,
+    queue: asyncio.Queue[tuple[AudioSegment, Chapter, ChapterTiming] | None],
+):
+    """Consumer: hand finished chapters to the writer until the None sentinel."""
+    while (item := await queue.get()) is not None:
+        await _in_writer_thread(writer.add_chapter, *item)
 
 
 async def convert(
@@ -55,14 +137,23 @@ async def convert(
     voice: str,
     language: str,
     fmt: str,
-    ref_audio_b64: str | None,
+    ref_audio_path: Path | None,
     ref_text: str | None = None,
+    tts: TTSClient | None = None,
 ):
-    """Run the full conversion pipeline."""
-    tts = TTSClient()
+    """Run the full conversion pipeline.
+
+    Uses the given TTS client if any (left open), else a private one.
+    """
+    owns_tts = tts is None
+    if tts is None:
+        tts = TTSClient()
     job_dir = OUTPUT_DIR / job_id
     job_dir.mkdir(parents=True, exist_ok=True)
-    use_clone = ref_audio_b64 is not None
+    use_clone = ref_audio_path is not None
+    writer: M4BWriter | MP3ZipWriter | None = None
+    assembly: asyncio.Task | None = None
+    output: Path | None = None
 
     try:
         # 1. Extract text + cover art
@@ -71,70 +162,91 @@ async def convert(
         await jobs.update_chapters_total(job_id, len(result.chapters))
         logger.info("Job %s: extracted %d chapters from %s", job_id, len(result.chapters), file_path.name)
 
-        # 1b. Auto-transcribe reference audio if voice cloning without ref_text
-        if use_clone and not ref_text:
-            import base64
-            ref_audio_raw = base64.b64decode(ref_audio_b64)
-            ref_text = await tts.transcribe(ref_audio_raw)
-            logger.info("Job %s: auto-transcribed ref_audio: %s", job_id, ref_text[:100])
+        # 1b. Load reference audio; auto-transcribe it if voice cloning without ref_text
+        ref_audio_b64 = None
+        if use_clone:
+            ref_audio = ref_audio_path.read_bytes()
+            if not ref_text:
+                ref_text = await tts.transcribe(ref_audio)
+                logger.info("Job %s: auto-transcribed ref_audio: %s", job_id, ref_text[:100])
+            ref_audio_b64 = base64.b64encode(ref_audio).decode("ascii")
 
-        # 2. Generate audio per chapter
+        # 2. Generate audio per chapter; finished chapters are encoded in the
+        # background while the next one is generating
         await jobs.update_status(job_id, "generating")
-        chapter_audios: list[AudioSegment] = []
-        chapter_timings: list[ChapterTiming] = []
+        if fmt == "m4b":
+            writer = M4BWriter(job_dir, result.metadata, result.cover_image)
+        else:
+            writer = MP3ZipWriter(job_dir, result.metadata, result.cover_image, len(result.chapters))
+        chapter_queue: asyncio.Queue[tuple[AudioSegment, Chapter, ChapterTiming] | None] = asyncio.Queue()
+        assembly = asyncio.create_task(_assemble_chapters(writer, chapter_queue))
 
         for i, chapter in enumerate(result.chapters):
             chunks = chunk_text(chapter.text)
-            await jobs.update_chunk_progress(job_id, 0, len(chunks))
-
-            chunk_wavs: list[bytes] = []
-            chunk_timings: list[ChunkTiming] = []
-            paragraph_breaks: list[bool] = []
+            chunk_audio: list[PCMAudio | None] = [None] * len(chunks)
 
+            # Serve cache hits first; only misses go to the TTS server
+            to_generate: list[tuple[int, str]] = []
             for j, chunk in enumerate(chunks):
                 cache_key = _cache_key(chunk.text, voice, language, use_clone)
                 cached = _get_cached(cache_key)
+                if cached is None and _adopt_legacy_cache(
+                    _legacy_cache_key(chunk.text, voice, language, use_clone), cache_key,
+                ):
+                    cached = _get_cached(cache_key)
 
                 if cached:
-                    wav_bytes = cached
                     logger.debug("Job %s: chunk %d/%d (ch %d) from cache", job_id, j + 1, len(chunks), i + 1)
+                    chunk_audio[j] = cached
                 else:
-                    logger.info("Job %s: generating chunk %d/%d (ch %d/%d, %d words)",
-                                job_id, j + 1, len(chunks), i + 1, len(result.chapters), len(chunk.text.split()))
-                    if use_clone:
-                        wav_bytes = await tts.generate_clone(chunk.text, ref_audio_b64, language, ref_text=ref_text)
-                    else:
-                        wav_bytes = await tts.generate_preset(chunk.text, voice, language)
-                    _save_cache(cache_key, wav_bytes)
-
-                chunk_wavs.append(wav_bytes)
-                duration = _get_wav_duration_secs(wav_bytes)
-                chunk_timings.append(ChunkTiming(sentences=chunk.sentences, duration_secs=duration))
-                paragraph_breaks.append(chunk.paragraph_break)
-
-                await jobs.update_chunk_progress(job_id, j + 1, len(chunks))
-
-            # Assemble chapter WAV
-            chapter_audio, _ = assemble_chapter_wav(chunk_wavs, paragraph_breaks)
-            chapter_audios.append(chapter_audio)
-            chapter_timings.append(ChapterTiming(title=chapter.title, chunks=chunk_timings))
+                    to_generate.append((j, cache_key))
+
+            chunks_done = len(chunks) - len(to_generate)
+            await jobs.update_chunk_progress(job_id, chunks_done, len(chunks))
+
+            async def _on_generated(k: int, audio: PCMAudio):
+                nonlocal chunks_done
+                j, cache_key = to_generate[k]
+                _save_cache(cache_key, audio)
+                chunk_audio[j] = audio
+                chunks_done += 1
+                logger.info("Job %s: generated chunk %d/%d (ch %d/%d, %d words)",
+                            job_id, j + 1, len(chunks), i + 1, len(result.chapters), chunks[j].word_count)
+                await jobs.update_chunk_progress(job_id, chunks_done, len(chunks))
+
+            if to_generate:
+                logger.info("Job %s: generating %d chunks for ch %d/%d",
+                            job_id, len(to_generate), i + 1, len(result.chapters))
+                await tts.generate_many(
+                    [chunks[j].text for j, _ in to_generate],
+                    concurrency=MAX_CONCURRENT_TTS,
+                    on_done=_on_generated,
+                    voice=voice,
+                    language=language,
+                    ref_audio_b64=ref_audio_b64,
+                    ref_text=ref_text,
+                )
+
+            chunk_timings = [
+                ChunkTiming(sentences=chunk.sentences, duration_secs=audio.duration_secs)
+                for chunk, audio in zip(chunks, chunk_audio)
+            ]
+            paragraph_breaks = [chunk.paragraph_break for chunk in chunks]
+
+            # Assemble chapter audio and hand it to the background encoder
+            chapter_audio, _ = assemble_chapter_wav(chunk_audio, paragraph_breaks)
+            if assembly.done():
+                assembly.result()  # surface an encoder failure instead of generating on
+            await chapter_queue.put((chapter_audio, chapter, ChapterTiming(title=chapter.title, chunks=chunk_timings)))
 
             await jobs.update_chapter_progress(job_id, i + 1)
             logger.info("Job %s: chapter %d/%d complete", job_id, i + 1, len(result.chapters))
 
-        # 3. Assemble final audiobook
+        # 3. Finish encoding and assemble final audiobook
         await jobs.update_status(job_id, "assembling")
-
-        if fmt == "m4b":
-            output = assemble_m4b(
-                job_dir, chapter_audios, result.chapters,
-                result.metadata, result.cover_image, chapter_timings,
-            )
-        else:
-            output = assemble_mp3_zip(
-                job_dir, chapter_audios, result.chapters,
-                result.metadata, result.cover_image, chapter_timings,
-            )
+        await chapter_queue.put(None)
+        await assembly
+        output = await _in_writer_thread(writer.finish)
 
         await jobs.update_status(job_id, "completed")
         logger.info("Job %s: completed — %s", job_id, output)
@@ -146,4 +258,11 @@ async def convert(
         logger.exception("Job %s failed: %s", job_id, e)
         await jobs.update_status(job_id, "failed", error=str(e))
     finally:
-        await tts.close()
+        if assembly is not None:
+            assembly.cancel()
+            # Returns once any add_chapter still running on a thread is done
+            await asyncio.wait({assembly})
+        if writer is not None and output is None:
+            await asyncio.to_thread(writer.abort)
+        if owns_tts:
+            await tts.close()
@@ -10,6 +10,21 @@ from pathlib import Path
 
 logger = logging.getLogger("audiobook-api.extractor")
 
+# _clean_text passes
+_RE_PAGE_NUM = re.compile(r"^\s*\d+\s*$", re.MULTILINE)  # standalone digits on a line
+# Blank-line runs, or space/tab runs other than a lone space (already clean)
+_RE_WHITESPACE = re.compile(r"\n\n\n+| [ \t]+|\t[ \t]*")
+
+# Chapter heading patterns
+_RE_PDF_CHAPTER = re.compile(
+    r"^(Chapter\s+\d+[.:]*\s*.*|CHAPTER\s+\d+[.:]*\s*.*|Part\s+\d+[.:]*\s*.*|PART\s+\d+[.:]*\s*.*)$",
+    re.MULTILINE,
+)
+_RE_TXT_CHAPTER = re.compile(
+    r"^(Chapter\s+\d+[.:]*\s*.*|CHAPTER\s+\d+[.:]*\s*.*)$",
+    re.MULTILINE,
+)
+
 
 @dataclass
 class Chapter:
@@ -37,15 +52,19 @@ class ExtractionResult:
 def _clean_text(text: str) -> str:
     """Normalize Unicode, collapse whitespace, strip junk."""
     text = unicodedata.normalize("NFKC", text)
-    # Remove page numbers (standalone digits on a line)
-    text = re.sub(r"^\s*\d+\s*$", "", text, flags=re.MULTILINE)
-    # Collapse multiple blank lines
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    # Collapse multiple spaces
-    text = re.sub(r"[ \t]+", " ", text)
+    # Remove page numbers (standalone digits on a line). Kept as its own pass:
+    # a match can span lines, and the blank-line runs it leaves behind must
+    # still be collapsed below.
+    text = _RE_PAGE_NUM.sub("", text)
+    # Collapse multiple blank lines and multiple spaces in one pass
+    text = _RE_WHITESPACE.sub(_collapse_whitespace, text)
     return text.strip()
 
 
+def _collapse_whitespace(match: re.Match) -> str:
+    return "\n\n" if match.group()[0] == "\n" else " "
+
+
 def extract(file_path: Path) -> ExtractionResult:
     """Extract chapters, metadata, and cover art from a file."""
     suffix = file_path.suffix.lower()
@@ -61,6 +80,21 @@ def extract(file_path: Path) -> ExtractionResult:
         raise ValueError(f"Unsupported file format: {suffix}")
 
 
+def _html_text(content: bytes) -> str:
+    """Get the text of an ePub XHTML document, one text node per line.
+
+    Parses with lxml (libxml2) when available, which is faster than the
+    pure-Python html.parser and yields the same text.
+    """
+    from bs4 import BeautifulSoup, FeatureNotFound
+
+    try:
+        soup = BeautifulSoup(content, "lxml")
+    except FeatureNotFound:
+        soup = BeautifulSoup(content, "html.parser")
+    return soup.get_text(separator="\n")
+
+
 def _extract_epub(file_path: Path) -> ExtractionResult:
     """Extract from ePub using ebooklib + BeautifulSoup.
 
@@ -69,7 +103,6 @@ def _extract_epub(file_path: Path) -> ExtractionResult:
     (dedication, contents, notes, index, copyright, etc.).
     """
     import ebooklib
-    from bs4 import BeautifulSoup
     from ebooklib import epub
 
     book = epub.read_epub(str(file_path), options={"ignore_ncx": True})
@@ -116,20 +149,22 @@ def _extract_epub(file_path: Path) -> ExtractionResult:
         fname = (getattr(item, "file_name", "") or item.get_name() or "").split("/")[-1]
         all_docs[fname] = item.get_content()
 
-    # Build TOC entries as (href_base, title) in order
+    # Build TOC entries as (href_base, title) in document order. Walks the
+    # nested TOC with an explicit stack (children pushed reversed so they pop
+    # in order) rather than recursing per level.
     toc_entries: list[tuple[str, str]] = []
-    def _walk_toc(toc_items):
-        for item in toc_items:
-            if isinstance(item, tuple):
-                section, children = item
-                if hasattr(section, "href"):
-                    href_base = section.href.split("#")[0].split("/")[-1]
-                    toc_entries.append((href_base, section.title))
-                _walk_toc(children)
-            elif hasattr(item, "href") and hasattr(item, "title"):
-                href_base = item.href.split("#")[0].split("/")[-1]
-                toc_entries.append((href_base, item.title))
-    _walk_toc(book.toc)
+    stack = list(reversed(book.toc))
+    while stack:
+        item = stack.pop()
+        if isinstance(item, tuple):
+            section, children = item
+            if hasattr(section, "href"):
+                href_base = section.href.split("#", 1)[0].rsplit("/", 1)[-1]
+                toc_entries.append((href_base, section.title))
+            stack.extend(reversed(children))
+        elif hasattr(item, "href") and hasattr(item, "title"):
+            href_base = item.href.split("#", 1)[0].rsplit("/", 1)[-1]
+            toc_entries.append((href_base, item.title))
 
     # Skip front/back matter TOC entries
     SKIP_TITLES = {"title page", "dedication", "contents", "copyright",
@@ -171,10 +206,7 @@ def _extract_epub(file_path: Path) -> ExtractionResult:
             # Merge all docs in this range
             texts = []
             for idx in range(start_idx, end_idx):
-                content = all_docs[doc_names[idx]]
-                soup = BeautifulSoup(content, "html.parser")
-                text = soup.get_text(separator="\n")
-                text = _clean_text(text)
+                text = _clean_text(_html_text(all_docs[doc_names[idx]]))
                 if text:
                     texts.append(text)
 
@@ -186,8 +218,7 @@ def _extract_epub(file_path: Path) -> ExtractionResult:
         # Fallback: concatenate everything as one chapter
         all_text = []
         for content in all_docs.values():
-            soup = BeautifulSoup(content, "html.parser")
-            all_text.append(soup.get_text(separator="\n"))
+            all_text.append(_html_text(content))
         combined = _clean_text("\n\n".join(all_text))
         if combined:
             chapters = [Chapter(title=meta.title, text=combined)]
@@ -220,11 +251,7 @@ def _extract_pdf(file_path: Path) -> ExtractionResult:
     full_text = _clean_text("\n\n".join(pages))
 
     # Try to detect chapters via heading patterns
-    chapter_pattern = re.compile(
-        r"^(Chapter\s+\d+[.:]*\s*.*|CHAPTER\s+\d+[.:]*\s*.*|Part\s+\d+[.:]*\s*.*|PART\s+\d+[.:]*\s*.*)$",
-        re.MULTILINE,
-    )
-    matches = list(chapter_pattern.finditer(full_text))
+    matches = list(_RE_PDF_CHAPTER.finditer(full_text))
 
     chapters = []
     if matches:
@@ -314,11 +341,7 @@ def _extract_txt(file_path: Path) -> ExtractionResult:
     meta = BookMetadata(title=file_path.stem)
 
     # Try to detect chapters
-    chapter_pattern = re.compile(
-        r"^(Chapter\s+\d+[.:]*\s*.*|CHAPTER\s+\d+[.:]*\s*.*)$",
-        re.MULTILINE,
-    )
-    matches = list(chapter_pattern.finditer(text))
+    matches = list(_RE_TXT_CHAPTER.finditer(text))
 
     chapters = []
     if matches:
@@ -2,13 +2,23 @@
 # ABOUTME: Tracks job status, progress (chapters/chunks), and error state
 from __future__ import annotations
 
-import uuid
-from datetime import datetime, timezone
+import asyncio
+import contextlib
+import logging
+import secrets
+import time
+from collections.abc import AsyncIterator
 
 import aiosqlite
 
+logger = logging.getLogger("audiobook-api.jobs")
+
 DB_PATH = "data/jobs.db"
 
+# Chunk progress is buffered in memory and written at most this often
+PROGRESS_FLUSH_SECS = 1.0
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS jobs (
     id TEXT PRIMARY KEY,
@@ -23,22 +33,146 @@ CREATE TABLE IF NOT EXISTS jobs (
     chunks_current_total INTEGER DEFAULT 0,
     chunks_current_done INTEGER DEFAULT 0,
     error TEXT,
-    created_at TEXT,
-    updated_at TEXT,
-    completed_at TEXT
+    created_at REAL,    -- Unix epoch seconds
+    updated_at REAL,
+    completed_at REAL
 );
+CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at DESC);
+"""
+
+# Per-connection tuning. With WAL, synchronous=NORMAL only fsyncs at
+# checkpoints, so progress updates no longer pay an fsync per commit.
+# busy_timeout is left to sqlite3's own 5 s connect timeout.
+PRAGMAS = """
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-65536;
+PRAGMA mmap_size=268435456;
 """
 
 
+# One connection shared by the whole (single-process) server, opened by
+# init_db. Keeps SQLite's page cache warm instead of reopening per call.
+_db: aiosqlite.Connection | None = None
+# Serializes write transactions so concurrent jobs can't commit each
+# other's half-finished statements
+_write_lock = asyncio.Lock()
+
+# job_id -> latest (chunks_done, chunks_total, updated_at) not yet written
+_pending_chunks: dict[str, tuple[int, int, float]] = {}
+_flush_task: asyncio.Task | None = None
+
+
 async def init_db():
-    """Create tables if they don't exist."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.executescript(SCHEMA)
-        await db.commit()
+    """Open the shared connection, switch to WAL, and create tables."""
+    global _db, _flush_task
+    _db = await aiosqlite.connect(DB_PATH)
+    _db.row_factory = aiosqlite.Row
+    # journal_mode is persistent in the database file; the rest is per connection
+    await _db.execute("PRAGMA journal_mode=WAL")
+    await _db.executescript(PRAGMAS)
+    await _migrate_iso_timestamps(_db)
+    await _db.executescript(SCHEMA)
+    await _db.commit()
+    _flush_task = asyncio.create_task(_flush_chunk_progress_loop())
+
+
+async def _migrate_iso_timestamps(db: aiosqlite.Connection):
+    """Rebuild a jobs table from before epoch timestamps.
+
+    Its columns were declared TEXT, whose affinity would store REAL values
+    back as strings, so the table is recreated and ISO-8601 values are
+    converted to epoch seconds.
+    """
+    async with db.execute("SELECT type FROM pragma_table_info('jobs') WHERE name = 'created_at'") as cursor:
+        row = await cursor.fetchone()
+    if row is None or row[0] != "TEXT":
+        return
+
+    columns = ("id, status, filename, format, voice, language, use_clone, chapters_total, chapters_done, "
+               "chunks_current_total, chunks_current_done, error")
+    await db.executescript(f"""
+        BEGIN;
+        ALTER TABLE jobs RENAME TO jobs_legacy;
+        DROP INDEX IF EXISTS idx_jobs_created_at;
+        {SCHEMA}
+        INSERT INTO jobs ({columns}, created_at, updated_at, completed_at)
+        SELECT {columns},
+               round((julianday(created_at) - 2440587.5) * 86400.0, 3),
+               round((julianday(updated_at) - 2440587.5) * 86400.0, 3),
+               round((julianday(completed_at) - 2440587.5) * 86400.0, 3)
+        FROM jobs_legacy;
+        DROP TABLE jobs_legacy;
+        COMMIT;
+    """)
+    logger.info("Migrated job timestamps from ISO-8601 text to epoch seconds")
+
+
+async def close_db():
+    """Write buffered progress and close the shared connection."""
+    global _db, _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _flush_task
+        _flush_task = None
+    if _db is not None:
+        await flush_chunk_progress()
+        await _db.close()
+        _db = None
+
+
+@contextlib.asynccontextmanager
+async def _transaction() -> AsyncIterator[aiosqlite.Connection]:
+    """Run writes on the shared connection as one committed transaction."""
+    async with _write_lock:
+        try:
+            yield _db
+        except BaseException:
+            await _db.rollback()
+            raise
+        await _db.commit()
+
+
+async def flush_chunk_progress():
+    """Write all buffered chunk progress in a single transaction."""
+    async with _transaction() as db:
+        # Snapshot under the lock so a chapter reset queued behind us
+        # can't be overwritten by stale chunk counts
+        pending = [(done, total, now, job_id) for job_id, (done, total, now) in _pending_chunks.items()]
+        _pending_chunks.clear()
+        if pending:
+            await db.executemany(
+                # max(): a status change may have been written since this progress
+                "UPDATE jobs SET chunks_current_done=?, chunks_current_total=?, updated_at=max(updated_at, ?) WHERE id=?",
+                pending,
+            )
+
+
+async def _flush_chunk_progress_loop():
+    """Background task: periodically persist buffered chunk progress."""
+    while True:
+        await asyncio.sleep(PROGRESS_FLUSH_SECS)
+        if not _pending_chunks:
+            continue
+        try:
+            await flush_chunk_progress()
+        except Exception:
+            logger.exception("Failed to flush chunk progress")
+
+
+def _job_row(row: aiosqlite.Row) -> dict:
+    """Row as dict, with any chunk progress still buffered in memory applied."""
+    job = dict(row)
+    pending = _pending_chunks.get(job["id"])
+    if pending:
+        job["chunks_current_done"], job["chunks_current_total"], _ = pending
+    return job
 
 
 def new_job_id() -> str:
-    return uuid.uuid4().hex[:12]
+    """12 URL-safe chars carrying 72 random bits."""
+    return secrets.token_urlsafe(9)
 
 
 async def create_job(
@@ -50,38 +184,38 @@ async def create_job(
     use_clone: bool,
 ) -> dict:
     """Insert a new job and return its row as dict."""
-    now = datetime.now(timezone.utc).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
+    now = time.time()
+    async with _transaction() as db:
+        async with db.execute(
             """INSERT INTO jobs (id, status, filename, format, voice, language, use_clone, created_at, updated_at)
-               VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)""",
+               VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)
+               RETURNING *""",
             (job_id, filename, fmt, voice, language, int(use_clone), now, now),
-        )
-        await db.commit()
-    return await get_job(job_id)
+        ) as cursor:
+            row = await cursor.fetchone()
+    return dict(row)
 
 
 async def get_job(job_id: str) -> dict | None:
     """Fetch a single job by ID."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)) as cursor:
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+    async with _db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)) as cursor:
+        row = await cursor.fetchone()
+        return _job_row(row) if row else None
 
 
 async def list_jobs() -> list[dict]:
     """List all jobs, newest first."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM jobs ORDER BY created_at DESC") as cursor:
-            return [dict(row) async for row in cursor]
+    async with _db.execute("SELECT * FROM jobs ORDER BY created_at DESC") as cursor:
+        return [_job_row(row) async for row in cursor]
 
 
 async def update_status(job_id: str, status: str, error: str | None = None):
     """Update job status and optionally set error."""
-    now = datetime.now(timezone.utc).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
+    if status in TERMINAL_STATUSES:
+        # Make the final progress durable along with the terminal state
+        await flush_chunk_progress()
+    now = time.time()
+    async with _transaction() as db:
         if error:
             await db.execute(
                 "UPDATE jobs SET status=?, error=?, updated_at=? WHERE id=?",
@@ -97,41 +231,35 @@ async def update_status(job_id: str, status: str, error: str | None = None):
                 "UPDATE jobs SET status=?, updated_at=? WHERE id=?",
                 (status, now, job_id),
             )
-        await db.commit()
 
 
 async def update_chapters_total(job_id: str, total: int):
-    now = datetime.now(timezone.utc).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
+    now = time.time()
+    async with _transaction() as db:
         await db.execute(
             "UPDATE jobs SET chapters_total=?, updated_at=? WHERE id=?",
             (total, now, job_id),
         )
-        await db.commit()
 
 
 async def update_chapter_progress(job_id: str, done: int):
-    now = datetime.now(timezone.utc).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
+    now = time.time()
+    _pending_chunks.pop(job_id, None)  # superseded by the reset below
+    async with _transaction() as db:
         await db.execute(
             "UPDATE jobs SET chapters_done=?, chunks_current_done=0, chunks_current_total=0, updated_at=? WHERE id=?",
             (done, now, job_id),
         )
-        await db.commit()
 
 
 async def update_chunk_progress(job_id: str, done: int, total: int):
-    now = datetime.now(timezone.utc).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE jobs SET chunks_current_done=?, chunks_current_total=?, updated_at=? WHERE id=?",
-            (done, total, now, job_id),
-        )
-        await db.commit()
+    """Record chunk progress; written by the background flush, not per call."""
+    now = time.time()
+    _pending_chunks[job_id] = (done, total, now)
 
 
 async def delete_job(job_id: str):
     """Delete a job record."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    _pending_chunks.pop(job_id, None)
+    async with _transaction() as db:
         await db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
-        await db.commit()
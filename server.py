@@ -4,13 +4,15 @@
 from __future__ import annotations
 
 import asyncio
-import base64
 import ipaddress
 import logging
 import shutil
+import socket
 import time
+from datetime import datetime, timezone
 from pathlib import Path
 
+import orjson
 from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.responses import FileResponse, JSONResponse
 
@@ -24,6 +26,8 @@ logger = logging.getLogger("audiobook-api")
 UPLOAD_DIR = Path("data/uploads")
 OUTPUT_DIR = Path("data/output")
 MAX_UPLOAD_BYTES = 100 * 1024 * 1024  # 100 MB
+UPLOAD_CHUNK_BYTES = 1 << 20  # read uploads 1 MB at a time
+DOWNLOAD_CHUNK_BYTES = 1 << 20  # send audiobooks 1 MB per read()/send
 
 ALLOWED_EXTENSIONS = {".epub", ".pdf", ".docx", ".txt"}
 ALLOWED_FORMATS = {"m4b", "mp3"}
@@ -35,8 +39,39 @@ ALLOWED_NETWORKS = [
     ipaddress.ip_network("100.64.0.0/10"),
 ]
 
+
+def _prefix_table(networks: list[ipaddress.IPv4Network | ipaddress.IPv6Network]) -> dict[int, dict[int, set[int]]]:
+    """IP version -> {host bits: network prefixes as ints} for shift-and-lookup matching."""
+    table: dict[int, dict[int, set[int]]] = {4: {}, 6: {}}
+    for network in networks:
+        host_bits = network.max_prefixlen - network.prefixlen
+        table[network.version].setdefault(host_bits, set()).add(int(network.network_address) >> host_bits)
+    return table
+
+
+_ALLOWED_PREFIXES = _prefix_table(ALLOWED_NETWORKS)
+_LOOPBACK_HOSTS = frozenset({"127.0.0.1", "::1"})
+
 app = FastAPI(title="Audiobook API", version="0.1.0")
 
+
+class _JobsResponse(JSONResponse):
+    """JSON rendered with orjson for the polled job endpoints.
+
+    Returned directly, so FastAPI's jsonable_encoder pass is skipped too;
+    _format_job output is plain str/int/float/None already.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+class _DownloadResponse(FileResponse):
+    """FileResponse sending multi-hundred-MB audiobooks in 1 MB reads rather than 64 KB."""
+
+    chunk_size = DOWNLOAD_CHUNK_BYTES
+
+
 # Track running background tasks to prevent GC
 _running_tasks: dict[str, asyncio.Task] = {}
 
@@ -44,36 +79,53 @@ _running_tasks: dict[str, asyncio.Task] = {}
 @app.middleware("http")
 async def restrict_ip(request: Request, call_next):
     """Reject requests not from localhost or Tailscale."""
-    client_ip = ipaddress.ip_address(request.client.host)
-    if not any(client_ip in network for network in ALLOWED_NETWORKS):
-        logger.warning("Blocked request from %s", client_ip)
+    host = request.client.host
+    # Nearly all traffic is local; skip parsing for the loopback literals
+    if host not in _LOOPBACK_HOSTS and not _ip_allowed(host):
+        logger.warning("Blocked request from %s", host)
         return JSONResponse(status_code=403, content={"detail": "Forbidden"})
     return await call_next(request)
 
 
+def _ip_allowed(host: str) -> bool:
+    """Check host against ALLOWED_NETWORKS via its integer form, without ipaddress objects."""
+    for family, version in ((socket.AF_INET, 4), (socket.AF_INET6, 6)):
+        try:
+            addr = int.from_bytes(socket.inet_pton(family, host))
+        except OSError:
+            continue
+        return any(addr >> host_bits in prefixes for host_bits, prefixes in _ALLOWED_PREFIXES[version].items())
+    return False  # not an IP address
+
+
 @app.on_event("startup")
 async def startup():
     UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     Path("data/cache").mkdir(parents=True, exist_ok=True)
     await jobs.init_db()
+    # One client for all jobs and health checks, so TTS connections are reused
+    app.state.tts = TTSClient()
     logger.info("Audiobook API started on port 8767")
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.tts.close()
+    await jobs.close_db()
+
+
 @app.get("/health")
 async def health():
     """Service health + TTS dependency check."""
-    tts = TTSClient()
     tts_status = "unknown"
     tts_detail = None
     try:
-        tts_health = await tts.health_check()
+        tts_health = await app.state.tts.health_check()
         tts_status = tts_health.get("status", "unknown")
     except Exception as e:
         tts_status = "unreachable"
         tts_detail = str(e)
-    finally:
-        await tts.close()
 
     return {
         "status": "ok" if tts_status in ("ok", "degraded") else "degraded",
@@ -106,44 +158,54 @@ async def start_conversion(
     if suffix not in ALLOWED_EXTENSIONS:
         raise HTTPException(400, f"Unsupported file type: {suffix}. Use: {ALLOWED_EXTENSIONS}")
 
-    # Read and validate file size
-    content = await file.read()
-    if len(content) > MAX_UPLOAD_BYTES:
-        raise HTTPException(400, f"File too large: {len(content)} bytes (max {MAX_UPLOAD_BYTES})")
-
     # Create job
     job_id = jobs.new_job_id()
 
-    # Save uploaded file
+    # Stream uploads to disk, enforcing the size limit as bytes arrive
     job_upload_dir = UPLOAD_DIR / job_id
     job_upload_dir.mkdir(parents=True, exist_ok=True)
     file_path = job_upload_dir / filename
-    file_path.write_bytes(content)
-
-    # Handle reference audio for voice cloning
-    ref_audio_b64 = None
-    if ref_audio and ref_audio.filename:
-        ref_content = await ref_audio.read()
-        ref_audio_b64 = base64.b64encode(ref_content).decode("ascii")
+    ref_audio_path = None
+    try:
+        await _save_upload(file, file_path)
+        # Reference audio for voice cloning
+        if ref_audio and ref_audio.filename:
+            ref_audio_path = job_upload_dir / f"ref_{Path(ref_audio.filename).name}"
+            await _save_upload(ref_audio, ref_audio_path)
+    except BaseException:
+        shutil.rmtree(job_upload_dir, ignore_errors=True)
+        raise
 
-    await jobs.create_job(job_id, filename, format, voice, language, use_clone=ref_audio_b64 is not None)
+    await jobs.create_job(job_id, filename, format, voice, language, use_clone=ref_audio_path is not None)
 
     # Launch background conversion (ref_text auto-transcribed via Whisper STT)
-    task = asyncio.create_task(convert(job_id, file_path, voice, language, format, ref_audio_b64))
+    task = asyncio.create_task(convert(job_id, file_path, voice, language, format, ref_audio_path, tts=app.state.tts))
     _running_tasks[job_id] = task
     task.add_done_callback(lambda t: _running_tasks.pop(job_id, None))
 
     logger.info("Job %s created: %s → %s (voice=%s, lang=%s, clone=%s)",
-                job_id, filename, format, voice, language, ref_audio_b64 is not None)
+                job_id, filename, format, voice, language, ref_audio_path is not None)
 
     return {"job_id": job_id, "status": "queued"}
 
 
+async def _save_upload(upload: UploadFile, dest: Path):
+    """Copy an upload to dest in chunks, rejecting it once it exceeds MAX_UPLOAD_BYTES."""
+    size = 0
+    with dest.open("wb") as f:
+        while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(400, f"File too large: over {MAX_UPLOAD_BYTES} bytes")
+            f.write(chunk)
+
+
 @app.get("/jobs")
 async def list_all_jobs():
     """List all jobs with status."""
     all_jobs = await jobs.list_jobs()
-    return [_format_job(j) for j in all_jobs]
+    now = time.time()
+    return _JobsResponse([_format_job(j, now) for j in all_jobs])
 
 
 @app.get("/jobs/{job_id}")
@@ -152,7 +214,7 @@ async def get_job(job_id: str):
     job = await jobs.get_job(job_id)
     if not job:
         raise HTTPException(404, f"Job not found: {job_id}")
-    return _format_job(job)
+    return _JobsResponse(_format_job(job, time.time()))
 
 
 @app.get("/jobs/{job_id}/download")
@@ -176,13 +238,17 @@ async def download_job(job_id: str):
         media_type = "application/zip"
         dl_filename = Path(job["filename"]).stem + ".zip"
 
-    if not output_file.exists():
+    try:
+        stat_result = output_file.stat()
+    except FileNotFoundError:
         raise HTTPException(500, "Output file missing")
 
-    return FileResponse(
+    # Handing over the stat spares the response its own threaded os.stat
+    return _DownloadResponse(
         str(output_file),
         media_type=media_type,
         filename=dl_filename,
+        stat_result=stat_result,
     )
 
 
@@ -213,26 +279,25 @@ async def delete_job(job_id: str):
     if not job:
         raise HTTPException(404, f"Job not found: {job_id}")
 
-    # Cancel running task
+    # Cancel running task, and let its writer stop before the files go
     task = _running_tasks.get(job_id)
     if task and not task.done():
         task.cancel()
         logger.info("Cancelled running task for job %s", job_id)
+        await asyncio.wait({task})
 
-    # Clean up files
-    job_dir = OUTPUT_DIR / job_id
-    if job_dir.exists():
-        shutil.rmtree(job_dir)
-    upload_dir = UPLOAD_DIR / job_id
-    if upload_dir.exists():
-        shutil.rmtree(upload_dir)
+    # Clean up files off the event loop, both trees at once
+    await asyncio.gather(
+        asyncio.to_thread(shutil.rmtree, OUTPUT_DIR / job_id, ignore_errors=True),
+        asyncio.to_thread(shutil.rmtree, UPLOAD_DIR / job_id, ignore_errors=True),
+    )
 
     await jobs.delete_job(job_id)
     return {"deleted": job_id}
 
 
-def _format_job(job: dict) -> dict:
-    """Format a job row for API response."""
+def _format_job(job: dict, now: float) -> dict:
+    """Format a job row for API response; now is the request's clock reading, shared across rows."""
     # Calculate progress percentage
     chapters_total = job.get("chapters_total", 0) or 0
     chapters_done = job.get("chapters_done", 0) or 0
@@ -248,18 +313,13 @@ def _format_job(job: dict) -> dict:
         percent = (completed_weight / chapters_total) * 100
 
     # ETA estimation
-    created = job.get("created_at", "")
+    created = job.get("created_at")
     elapsed_secs = 0.0
     eta_secs = None
     if created:
-        from datetime import datetime, timezone
-        try:
-            start = datetime.fromisoformat(created)
-            elapsed_secs = (datetime.now(timezone.utc) - start).total_seconds()
-            if percent > 0:
-                eta_secs = round(elapsed_secs * (100 - percent) / percent)
-        except (ValueError, TypeError):
-            pass
+        elapsed_secs = now - created
+        if percent > 0:
+            eta_secs = round(elapsed_secs * (100 - percent) / percent)
 
     return {
         "job_id": job["id"],
@@ -280,11 +340,16 @@ def _format_job(job: dict) -> dict:
             "eta_secs": eta_secs,
         },
         "error": job.get("error"),
-        "created_at": job.get("created_at"),
-        "completed_at": job.get("completed_at"),
+        "created_at": _iso(job.get("created_at")),
+        "completed_at": _iso(job.get("completed_at")),
     }
 
 
+def _iso(ts: float | None) -> str | None:
+    """Epoch seconds from the job store as an ISO-8601 UTC string."""
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts is not None else None
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8767)
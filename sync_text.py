@@ -2,8 +2,12 @@
 # ABOUTME: Produces full-book LRC for M4B and per-chapter LRC for MP3 companion files
 from __future__ import annotations
 
+import itertools
 from dataclasses import dataclass
 
+# Longer sentences are cut short in LRC output for readability
+LRC_MAX_CHARS = 200
+
 
 @dataclass
 class ChunkTiming:
@@ -21,9 +25,13 @@ class ChapterTiming:
 
 def _format_timestamp(secs: float) -> str:
     """Format seconds as [mm:ss.xx] for LRC."""
-    minutes = int(secs // 60)
-    remainder = secs % 60
-    return f"[{minutes:02d}:{remainder:05.2f}]"
+    minutes, remainder = divmod(secs, 60.0)
+    return "[%02d:%05.2f]" % (minutes, remainder)
+
+
+def _truncate(text: str, limit: int = LRC_MAX_CHARS) -> str:
+    """Cut text to limit chars, marking the cut with an ellipsis."""
+    return text if len(text) <= limit else text[:limit] + "..."
 
 
 def _estimate_sentence_timestamps(chunks: list[ChunkTiming], offset: float = 0.0) -> list[tuple[float, str]]:
@@ -32,49 +40,42 @@ def _estimate_sentence_timestamps(chunks: list[ChunkTiming], offset: float = 0.0
     current_time = offset
 
     for chunk in chunks:
-        total_words = sum(len(s.split()) for s in chunk.sentences)
+        word_counts = [len(s.split()) for s in chunk.sentences]
+        total_words = sum(word_counts)
         if total_words == 0:
             current_time += chunk.duration_secs
             continue
 
-        for sentence in chunk.sentences:
+        for sentence, word_count in zip(chunk.sentences, word_counts):
             entries.append((current_time, sentence))
-            word_fraction = len(sentence.split()) / total_words
+            word_fraction = word_count / total_words
             current_time += chunk.duration_secs * word_fraction
 
     return entries
 
 
+def _chapter_lrc_lines(chapter: ChapterTiming, offset: float) -> list[str]:
+    """LRC lines for one chapter: its title marker, then one line per sentence."""
+    entries = _estimate_sentence_timestamps(chapter.chunks, offset)
+    fmt, trunc = _format_timestamp, _truncate
+    return [f"{fmt(offset)} {chapter.title}"] + [f"{fmt(ts)} {trunc(text)}" for ts, text in entries]
+
+
 def generate_full_lrc(chapters: list[ChapterTiming]) -> str:
     """Generate a full-book LRC string for M4B embedding."""
-    lines: list[str] = []
+    chapter_blocks: list[list[str]] = []
     offset = 0.0
 
     for chapter in chapters:
-        # Chapter title marker
-        lines.append(f"{_format_timestamp(offset)} {chapter.title}")
-
-        entries = _estimate_sentence_timestamps(chapter.chunks, offset)
-        for ts, text in entries:
-            # Truncate very long sentences for LRC readability
-            display = text[:200] + "..." if len(text) > 200 else text
-            lines.append(f"{_format_timestamp(ts)} {display}")
+        chapter_blocks.append(_chapter_lrc_lines(chapter, offset))
 
         # Advance offset by total chapter duration + 3s inter-chapter silence
         chapter_duration = sum(c.duration_secs for c in chapter.chunks)
         offset += chapter_duration + 3.0
 
-    return "\n".join(lines) + "\n"
+    return "\n".join(itertools.chain.from_iterable(chapter_blocks)) + "\n"
 
 
 def generate_chapter_lrc(chapter: ChapterTiming) -> str:
     """Generate a per-chapter LRC string for MP3 companion files."""
-    lines: list[str] = []
-    lines.append(f"{_format_timestamp(0.0)} {chapter.title}")
-
-    entries = _estimate_sentence_timestamps(chapter.chunks, offset=0.0)
-    for ts, text in entries:
-        display = text[:200] + "..." if len(text) > 200 else text
-        lines.append(f"{_format_timestamp(ts)} {display}")
-
-    return "\n".join(lines) + "\n"
+    return "\n".join(_chapter_lrc_lines(chapter, 0.0)) + "\n"
@@ -2,7 +2,13 @@
 # ABOUTME: Supports preset voice and voice cloning endpoints with retry logic
 from __future__ import annotations
 
+import asyncio
+import io
 import logging
+import random
+import wave
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 
 import httpx
 
@@ -13,6 +19,8 @@ STT_BASE_URL = "http://127.0.0.1:8766"
 REQUEST_TIMEOUT = 600.0  # 10 min for long-form chunks
 MAX_RETRIES = 3
 BACKOFF_SECS = [5, 10, 20]
+# Keep connections to the TTS server open between chunk requests
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=16, max_connections=32, keepalive_expiry=300)
 
 # ~300 words ≈ 2 min audio ≈ 1440 tokens at 12Hz codec
 # Conservative for MPS fp32 voice cloning; preset voices can handle more
@@ -20,6 +28,32 @@ AUDIOBOOK_MAX_TOKENS_CLONE = 1440
 AUDIOBOOK_MAX_TOKENS_PRESET = 3600  # ~5 min audio
 
 
+@dataclass
+class PCMAudio:
+    """Raw interleaved little-endian PCM plus its format."""
+    data: bytes
+    sample_width: int  # bytes per sample
+    frame_rate: int
+    channels: int
+
+    @property
+    def duration_secs(self) -> float:
+        return len(self.data) / (self.sample_width * self.frame_rate * self.channels)
+
+    @classmethod
+    def from_wav(cls, wav_bytes: bytes) -> PCMAudio:
+        """Strip the RIFF header from WAV bytes."""
+        try:
+            with wave.open(io.BytesIO(wav_bytes), "rb") as w:
+                return cls(w.readframes(w.getnframes()), w.getsampwidth(), w.getframerate(), w.getnchannels())
+        except wave.Error:
+            # Not integer PCM (e.g. float WAV): let pydub/ffmpeg convert it
+            from pydub import AudioSegment
+
+            seg = AudioSegment.from_wav(io.BytesIO(wav_bytes))
+            return cls(seg.raw_data, seg.sample_width, seg.frame_rate, seg.channels)
+
+
 class TTSClient:
     """Async client for Qwen3-TTS server."""
 
@@ -32,6 +66,7 @@ class TTSClient:
             self._client = httpx.AsyncClient(
                 base_url=self.base_url,
                 timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=10.0),
+                limits=HTTP_LIMITS,
             )
         return self._client
 
@@ -40,32 +75,29 @@ class TTSClient:
             await self._client.aclose()
 
     async def _request_with_retry(self, method: str, path: str, **kwargs) -> httpx.Response:
-        """Make HTTP request with exponential backoff retry on 5xx/timeout."""
-        import asyncio
-
-        last_exc = None
+        """Make HTTP request with jittered exponential backoff retry on 5xx/timeout."""
+        last_exc: Exception | None = None
         for attempt in range(MAX_RETRIES):
             try:
                 client = await self._get_client()
                 resp = await client.request(method, path, **kwargs)
-                if resp.status_code < 500:
-                    resp.raise_for_status()
-                    return resp
-                last_exc = httpx.HTTPStatusError(
-                    f"Server error {resp.status_code}",
-                    request=resp.request,
-                    response=resp,
-                )
-            except (httpx.TimeoutException, httpx.HTTPStatusError) as e:
+                resp.raise_for_status()
+                return resp
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code < 500:
+                    raise
+                last_exc = e
+            except (httpx.TimeoutException, asyncio.TimeoutError) as e:
                 last_exc = e
 
             if attempt < MAX_RETRIES - 1:
-                wait = BACKOFF_SECS[attempt]
-                logger.warning("TTS request failed (attempt %d/%d), retrying in %ds: %s",
+                # Jitter so jobs retrying a restarted TTS server don't arrive in lockstep
+                wait = BACKOFF_SECS[attempt] * (0.5 + random.random())
+                logger.warning("TTS request failed (attempt %d/%d), retrying in %.1fs: %s",
                                attempt + 1, MAX_RETRIES, wait, last_exc)
                 await asyncio.sleep(wait)
 
-        raise last_exc  # type: ignore[misc]
+        raise last_exc
 
     async def generate_preset(
         self,
@@ -73,8 +105,8 @@ class TTSClient:
         voice: str = "Aiden",
         language: str = "English",
         max_new_tokens: int = AUDIOBOOK_MAX_TOKENS_PRESET,
-    ) -> bytes:
-        """Generate TTS audio using a preset voice. Returns WAV bytes."""
+    ) -> PCMAudio:
+        """Generate TTS audio using a preset voice. Returns raw PCM."""
         resp = await self._request_with_retry(
             "POST",
             "/tts",
@@ -85,7 +117,7 @@ class TTSClient:
                 "max_new_tokens": max_new_tokens,
             },
         )
-        return resp.content
+        return PCMAudio.from_wav(resp.content)
 
     async def generate_clone(
         self,
@@ -94,8 +126,8 @@ class TTSClient:
         language: str = "English",
         max_new_tokens: int = AUDIOBOOK_MAX_TOKENS_CLONE,
         ref_text: str | None = None,
-    ) -> bytes:
-        """Generate TTS audio using voice cloning. Returns WAV bytes."""
+    ) -> PCMAudio:
+        """Generate TTS audio using voice cloning. Returns raw PCM."""
         payload: dict = {
             "text": text,
             "ref_audio": ref_audio_b64,
@@ -109,7 +141,45 @@ class TTSClient:
             "/tts/clone",
             json=payload,
         )
-        return resp.content
+        return PCMAudio.from_wav(resp.content)
+
+    async def generate_many(
+        self,
+        texts: list[str],
+        *,
+        concurrency: int = 4,
+        on_done: Callable[[int, PCMAudio], Awaitable[None]] | None = None,
+        voice: str = "Aiden",
+        language: str = "English",
+        ref_audio_b64: str | None = None,
+        ref_text: str | None = None,
+    ) -> list[PCMAudio]:
+        """Generate several texts with at most `concurrency` requests in flight.
+
+        Clones ref_audio_b64 when given, otherwise uses the preset voice. on_done
+        is awaited with (index, audio) as each text finishes; the results are
+        returned in input order. A failure cancels the remaining requests.
+        """
+        slots = asyncio.Semaphore(concurrency)
+
+        async def _generate(index: int, text: str) -> PCMAudio:
+            async with slots:
+                if ref_audio_b64 is not None:
+                    audio = await self.generate_clone(text, ref_audio_b64, language, ref_text=ref_text)
+                else:
+                    audio = await self.generate_preset(text, voice, language)
+            if on_done is not None:
+                await on_done(index, audio)
+            return audio
+
+        tasks = [asyncio.create_task(_generate(i, text)) for i, text in enumerate(texts)]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            # Don't leave sibling requests running after a failure or cancel
+            for task in tasks:
+                task.cancel()
+            raise
 
     async def transcribe(self, audio_bytes: bytes, filename: str = "audio.wav") -> str:
         """Transcribe audio via Whisper STT server. Returns transcript text."""